@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime, time, timedelta
+import math
+from datetime import datetime, time
 
 # Configure the page
 st.set_page_config(
@@ -11,7 +12,7 @@ st.set_page_config(
 )
 
 # Custom CSS for styling
-st.markdown("""
+CSS_BLOB = """
     <style>
     .main-header {
         font-size: 3rem;
@@ -48,7 +49,14 @@ st.markdown("""
         margin: 1rem 0;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+# Streamlit replays the cached element on later reruns instead of re-running the function
+@st.cache_resource(show_spinner=False)
+def _inject_css():
+    st.markdown(CSS_BLOB, unsafe_allow_html=True)
+
+_inject_css()
 
 # App title and description
 st.markdown('<h1 class="main-header">🌙 Sleep Schedule Analyzer</h1>', unsafe_allow_html=True)
@@ -72,80 +80,139 @@ with st.expander("ℹ️ About Sleep Health"):
     This tool helps you track and improve your sleep regularity and duration.
     """)
 
+# Function to create an empty sleep data store: parallel column arrays (struct of arrays) plus a row count.
+# Arrays are overallocated; only the first 'n' rows hold entries.
+def _new_store(capacity=16):
+    return {
+        'n': 0,
+        'date': np.empty(capacity, dtype='datetime64[D]'),
+        'bed_min': np.empty(capacity, dtype=np.int16),
+        'wake_min': np.empty(capacity, dtype=np.int16),
+        'dur': np.empty(capacity, dtype=np.float32),
+    }
+
+# Function to get views of the filled rows of the sleep data store
+def _columns():
+    store = st.session_state.sleep_data
+    n = store['n']
+    return store['date'][:n], store['bed_min'][:n], store['wake_min'][:n], store['dur'][:n]
+
 # Initialize session state for storing sleep data
 if 'sleep_data' not in st.session_state:
-    st.session_state.sleep_data = pd.DataFrame(columns=['Date', 'Bedtime', 'WakeTime', 'SleepDuration'])
+    st.session_state.sleep_data = _new_store()
 
 # Function to calculate sleep duration
 def calculate_sleep_duration(bedtime, waketime):
-    # Convert to datetime objects for calculation
-    if isinstance(bedtime, time):
-        bedtime_dt = datetime.combine(datetime.now().date(), bedtime)
-    else:
-        bedtime_dt = datetime.combine(datetime.now().date(), time(bedtime.hour, bedtime.minute))
+    # Work in minutes since midnight; the modulo handles overnight sleep (e.g., 11 PM to 7 AM)
+    bed_minutes = bedtime.hour * 60 + bedtime.minute
+    wake_minutes = waketime.hour * 60 + waketime.minute
+    return ((wake_minutes - bed_minutes) % 1440) / 60.0
+
+# Function to compute duration mean/std and bedtime std (in hours) in a single Welford pass
+def _stats(mins_bed, dur):
+    n = 0
+    mean_dur = 0.0
+    m2_dur = 0.0
+    mean_bed = 0.0
+    m2_bed = 0.0
+    for i in range(dur.shape[0]):
+        n += 1
+        delta = dur[i] - mean_dur
+        mean_dur += delta / n
+        m2_dur += delta * (dur[i] - mean_dur)
         
-    if isinstance(waketime, time):
-        waketime_dt = datetime.combine(datetime.now().date(), waketime)
-    else:
-        waketime_dt = datetime.combine(datetime.now().date(), time(waketime.hour, waketime.minute))
-    
-    if bedtime_dt > waketime_dt:  # Handle overnight sleep (e.g., 11 PM to 7 AM)
-        waketime_dt += timedelta(days=1)
-    
-    sleep_duration = (waketime_dt - bedtime_dt).total_seconds() / 3600  # Convert to hours
-    return sleep_duration
+        bed_hours = mins_bed[i] / 60.0
+        delta = bed_hours - mean_bed
+        mean_bed += delta / n
+        m2_bed += delta * (bed_hours - mean_bed)
+    return mean_dur, math.sqrt(m2_dur / (n - 1)), math.sqrt(m2_bed / (n - 1))
+
+# Function to compute the same stats with vectorized NumPy reductions, used when numba is unavailable
+def _stats_numpy(mins_bed, dur):
+    return dur.mean(), np.std(dur, ddof=1), np.std(mins_bed / 60.0, ddof=1)
+
+# Function to get the numba-compiled stats loop, importing numba on first use rather than at startup.
+# st.cache_resource keeps the dispatcher across reruns, which re-execute this script in a fresh namespace.
+@st.cache_resource(show_spinner=False)
+def _get_numba_stats():
+    try:
+        from numba import njit
+    except ImportError:  # numba is optional; an interpreted loop would be slow, so use NumPy reductions
+        return _stats_numpy
+    return njit(cache=True)(_stats)
 
 # Function to add new sleep entry
 def add_sleep_entry(date, bedtime, waketime):
     sleep_duration = calculate_sleep_duration(bedtime, waketime)
+    store = st.session_state.sleep_data
+    n = store['n']
     
-    new_entry = pd.DataFrame({
-        'Date': [date],
-        'Bedtime': [bedtime],
-        'WakeTime': [waketime],
-        'SleepDuration': [sleep_duration]
-    })
+    # Double the capacity when full so appends stay amortized O(1)
+    if n == len(store['dur']):
+        for col in ('date', 'bed_min', 'wake_min', 'dur'):
+            store[col] = np.concatenate([store[col], np.empty_like(store[col])])
     
-    st.session_state.sleep_data = pd.concat([st.session_state.sleep_data, new_entry], ignore_index=True)
-    st.success("Sleep entry added successfully!")
+    store['date'][n] = np.datetime64(date, 'D')
+    store['bed_min'][n] = bedtime.hour * 60 + bedtime.minute
+    store['wake_min'][n] = waketime.hour * 60 + waketime.minute
+    store['dur'][n] = sleep_duration
+    store['n'] = n + 1
+    st.session_state.entry_added = True
+
+# Callback for the form submit button; reads the submitted widget values from session state
+def _on_add_entry():
+    add_sleep_entry(
+        st.session_state.entry_date,
+        st.session_state.entry_bedtime,
+        st.session_state.entry_waketime
+    )
+
+# Recommendation lookup tables: thresholds are searched with np.searchsorted and index into the messages.
+# Sleep duration: below 7 hours, 7-9 hours inclusive, above 9 hours (the upper edge is nudged so 9.0 stays in range)
+_DUR_BUCKETS = np.array([7.0, np.nextafter(9.0, np.inf)])
+_DUR_MSGS = (
+    "Your average sleep duration is below the recommended 7-8 hours. Try to go to bed earlier or wake up later.",
+    "Your average sleep duration is within the recommended range. Great job!",
+    "Your average sleep duration is above the recommended 7-8 hours. While sleep needs vary, excessive sleep can sometimes indicate underlying health issues.",
+)
+
+# Bedtime consistency: up to 0.75 hours std, up to 1.5 hours std, above 1.5 hours std
+_BEDTIME_STD_BUCKETS = np.array([0.75, 1.5])
+_BEDTIME_STD_MSGS = (
+    "Your bedtime is consistent, which is excellent for maintaining healthy sleep patterns.",
+    "Your bedtime is somewhat irregular. Consider establishing a more consistent sleep schedule.",
+    "Your bedtime varies significantly. Try to go to bed at the same time each night to improve sleep quality.",
+)
+
+# Sleep duration consistency: only flagged above 1.5 hours std
+_SLEEP_STD_BUCKETS = np.array([1.5])
+_SLEEP_STD_MSGS = (
+    None,
+    "Your sleep duration varies considerably. Aim for a consistent amount of sleep each night.",
+)
 
 # Function to analyze sleep patterns
-def analyze_sleep_patterns(df):
-    if len(df) < 2:
+@st.cache_data(ttl=24*60*60, show_spinner=False)
+def analyze_sleep_patterns(bed_minutes, durations):
+    if len(durations) < 2:
         return {
-            'avg_sleep': df['SleepDuration'].mean() if len(df) > 0 else 0,
+            'avg_sleep': durations.mean() if len(durations) > 0 else 0,
             'sleep_consistency': 0,
             'recommendations': ["Add more data to get meaningful insights."]
         }
     
-    avg_sleep = df['SleepDuration'].mean()
-    sleep_std = df['SleepDuration'].std()
-    
-    # Calculate bedtime consistency (standard deviation of bedtime hours)
-    bedtimes = df['Bedtime'].apply(lambda x: x.hour + x.minute/60 if hasattr(x, 'hour') else 0)
-    bedtime_std = bedtimes.std()
+    # Average/std of sleep duration and bedtime consistency (std of bedtime hours)
+    avg_sleep, sleep_std, bedtime_std = _get_numba_stats()(bed_minutes, durations)
     
-    recommendations = []
-    
-    # Sleep duration recommendations
-    if avg_sleep < 7:
-        recommendations.append("Your average sleep duration is below the recommended 7-8 hours. Try to go to bed earlier or wake up later.")
-    elif avg_sleep > 9:
-        recommendations.append("Your average sleep duration is above the recommended 7-8 hours. While sleep needs vary, excessive sleep can sometimes indicate underlying health issues.")
-    else:
-        recommendations.append("Your average sleep duration is within the recommended range. Great job!")
-    
-    # Sleep consistency recommendations
-    if bedtime_std > 1.5:
-        recommendations.append("Your bedtime varies significantly. Try to go to bed at the same time each night to improve sleep quality.")
-    elif bedtime_std > 0.75:
-        recommendations.append("Your bedtime is somewhat irregular. Consider establishing a more consistent sleep schedule.")
-    else:
-        recommendations.append("Your bedtime is consistent, which is excellent for maintaining healthy sleep patterns.")
+    recommendations = [
+        _DUR_MSGS[int(np.searchsorted(_DUR_BUCKETS, avg_sleep, side='right'))],
+        _BEDTIME_STD_MSGS[int(np.searchsorted(_BEDTIME_STD_BUCKETS, bedtime_std))],
+    ]
     
     # Sleep duration consistency
-    if sleep_std > 1.5:
-        recommendations.append("Your sleep duration varies considerably. Aim for a consistent amount of sleep each night.")
+    sleep_std_msg = _SLEEP_STD_MSGS[int(np.searchsorted(_SLEEP_STD_BUCKETS, sleep_std))]
+    if sleep_std_msg:
+        recommendations.append(sleep_std_msg)
     
     return {
         'avg_sleep': avg_sleep,
@@ -153,58 +220,51 @@ def analyze_sleep_patterns(df):
         'recommendations': recommendations
     }
 
-# Main app layout
-col1, col2 = st.columns([1, 2])
-
-with col1:
-    st.markdown('<h2 class="sub-header">Add Sleep Entry</h2>', unsafe_allow_html=True)
+# Function to get the analysis, reusing the last result while the entries are unchanged.
+# Entries are only ever appended or cleared (which drops the memo), so count + last entry identifies the data.
+def _get_analysis():
+    dates, bed_minutes, wake_minutes, durations = _columns()
+    n = len(dates)
+    key = (n, (dates[-1].item(), int(bed_minutes[-1]), int(wake_minutes[-1])) if n else None)
     
-    # Use a form to collect sleep data
-    with st.form("sleep_form"):
-        date = st.date_input("Date", datetime.now().date())
-        bedtime = st.time_input("Bedtime", time(23, 0))
-        waketime = st.time_input("Wake Time", time(7, 0))
-        
-        submitted = st.form_submit_button("Add Entry")
-        
-        if submitted:
-            add_sleep_entry(date, bedtime, waketime)
-            st.rerun()  # Refresh to show updated data
+    memo = st.session_state.get('analysis_memo')
+    if memo is not None and memo[0] == key:
+        return memo[1]
+    
+    analysis = analyze_sleep_patterns(bed_minutes, durations)
+    st.session_state.analysis_memo = (key, analysis)
+    return analysis
 
-    # Display current sleep data
-    if not st.session_state.sleep_data.empty:
-        st.markdown('<h2 class="sub-header">Your Sleep Data</h2>', unsafe_allow_html=True)
-        display_df = st.session_state.sleep_data.copy()
-        
-        # Convert Date column to datetime if it's not already
-        if not pd.api.types.is_datetime64_any_dtype(display_df['Date']):
-            display_df['Date'] = pd.to_datetime(display_df['Date'])
-            
-        display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d')
-        display_df['Bedtime'] = display_df['Bedtime'].apply(lambda x: x.strftime('%H:%M') if hasattr(x, 'strftime') else str(x))
-        display_df['WakeTime'] = display_df['WakeTime'].apply(lambda x: x.strftime('%H:%M') if hasattr(x, 'strftime') else str(x))
-        display_df['SleepDuration'] = display_df['SleepDuration'].round(2)
-        display_df = display_df.rename(columns={
-            'Date': 'Date',
-            'Bedtime': 'Bedtime',
-            'WakeTime': 'Wake Time',
-            'SleepDuration': 'Hours Slept'
-        })
-        st.dataframe(display_df, use_container_width=True)
-        
-        if st.button("Clear All Data"):
-            st.session_state.sleep_data = pd.DataFrame(columns=['Date', 'Bedtime', 'WakeTime', 'SleepDuration'])
-            st.rerun()
+# Function to format sleep entries for the data table
+@st.cache_data(ttl=24*60*60, show_spinner=False)
+def format_display_df(dates, bed_minutes, wake_minutes, durations):
+    display_df = pd.DataFrame({
+        'Date': np.datetime_as_string(dates, unit='D'),
+        'Bedtime': [f"{m // 60:02d}:{m % 60:02d}" for m in bed_minutes.tolist()],
+        'WakeTime': [f"{m // 60:02d}:{m % 60:02d}" for m in wake_minutes.tolist()],
+        'SleepDuration': durations.round(2),
+    })
+    return display_df.rename(columns={
+        'Date': 'Date',
+        'Bedtime': 'Bedtime',
+        'WakeTime': 'Wake Time',
+        'SleepDuration': 'Hours Slept'
+    })
 
-with col2:
-    if not st.session_state.sleep_data.empty:
-        # Make sure Date column is datetime for analysis
-        analysis_df = st.session_state.sleep_data.copy()
-        if not pd.api.types.is_datetime64_any_dtype(analysis_df['Date']):
-            analysis_df['Date'] = pd.to_datetime(analysis_df['Date'])
-            
+# Function to build the chart data from the stored columns
+@st.cache_data(ttl=24*60*60, show_spinner=False)
+def build_chart_df(dates, bed_minutes, durations):
+    return pd.DataFrame({
+        'Date': dates,
+        'SleepDuration': durations,
+        'BedtimeHour': bed_minutes / np.float32(60.0),
+    })
+
+# Function to render the analysis, charts and recommendations
+def _render_analysis():
+    if st.session_state.sleep_data['n']:
         # Analyze sleep patterns
-        analysis = analyze_sleep_patterns(analysis_df)
+        analysis = _get_analysis()
         
         # Display metrics
         st.markdown('<h2 class="sub-header">Sleep Analysis</h2>', unsafe_allow_html=True)
@@ -222,36 +282,68 @@ with col2:
                      delta="Consistent" if analysis['sleep_consistency'] < 0.75 else "Variable")
             st.markdown('</div>', unsafe_allow_html=True)
         
-        # Sleep duration chart using Streamlit's native chart
-        if len(analysis_df) > 0:
-            chart_data = analysis_df.copy()
-            chart_data['DateStr'] = chart_data['Date'].dt.strftime('%m-%d')
-            st.subheader('Sleep Duration by Date')
-            st.bar_chart(chart_data.set_index('DateStr')['SleepDuration'])
-            
-            # Add reference lines for recommended sleep
-            st.caption("Recommended range: 7-9 hours per night")
-            
-            # Bedtime consistency chart
-            bedtimes_df = analysis_df.copy()
-            bedtimes_df['BedtimeHour'] = bedtimes_df['Bedtime'].apply(
-                lambda x: x.hour + x.minute/60 if hasattr(x, 'hour') else 0
-            )
-            bedtimes_df['DateStr'] = bedtimes_df['Date'].dt.strftime('%m-%d')
-            
-            st.subheader('Bedtime Consistency')
-            st.line_chart(bedtimes_df.set_index('DateStr')['BedtimeHour'])
+        # Sleep duration and bedtime consistency charts, sent to the frontend as one figure
+        import altair as alt
+        
+        dates, bed_minutes, _, durations = _columns()
+        chart_data = build_chart_df(dates, bed_minutes, durations)
+        base = alt.Chart(chart_data).encode(x=alt.X('yearmonthdate(Date):O', title='Date'))
+        duration_chart = base.mark_bar().encode(
+            y=alt.Y('SleepDuration:Q', title='Hours Slept')
+        ).properties(title='Sleep Duration by Date')
+        bedtime_chart = base.mark_line(point=True).encode(
+            y=alt.Y('BedtimeHour:Q', title='Bedtime (hour)')
+        ).properties(title='Bedtime Consistency')
+        st.altair_chart(alt.vconcat(duration_chart, bedtime_chart), use_container_width=True)
+        
+        # Add reference lines for recommended sleep
+        st.caption("Recommended range: 7-9 hours per night")
         
         # Recommendations
         st.markdown('<h2 class="sub-header">Recommendations</h2>', unsafe_allow_html=True)
-        for rec in analysis['recommendations']:
-            st.markdown(f'<div class="recommendation">📌 {rec}</div>', unsafe_allow_html=True)
-    
+        st.markdown(
+            "".join(f'<div class="recommendation">📌 {rec}</div>' for rec in analysis['recommendations']),
+            unsafe_allow_html=True
+        )
+
     else:
         st.info("Add your sleep data to see analysis and recommendations.")
         st.markdown("![Sleep Image](https://images.unsplash.com/photo-1541781774459-bb2af2f05b55?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80)")
         st.caption("Quality sleep is essential for good health")
 
+# Main app layout
+col1, col2 = st.columns([1, 2])
+
+with col1:
+    st.markdown('<h2 class="sub-header">Add Sleep Entry</h2>', unsafe_allow_html=True)
+    
+    # Use a form to collect sleep data
+    with st.form("sleep_form"):
+        st.date_input("Date", datetime.now().date(), key="entry_date")
+        st.time_input("Bedtime", time(23, 0), key="entry_bedtime")
+        st.time_input("Wake Time", time(7, 0), key="entry_waketime")
+        
+        # Streamlit reruns the script after the callback, so no explicit st.rerun() is needed
+        st.form_submit_button("Add Entry", on_click=_on_add_entry)
+    
+    if st.session_state.pop('entry_added', False):
+        st.success("Sleep entry added successfully!")
+
+    # Display current sleep data
+    if st.session_state.sleep_data['n']:
+        st.markdown('<h2 class="sub-header">Your Sleep Data</h2>', unsafe_allow_html=True)
+        display_df = format_display_df(*_columns())
+        st.dataframe(display_df, use_container_width=True)
+        
+        if st.button("Clear All Data"):
+            # Keep the allocated arrays; resetting the row count empties the store
+            st.session_state.sleep_data['n'] = 0
+            st.session_state.pop('analysis_memo', None)
+            st.rerun()
+
+with col2:
+    _render_analysis()
+
 # Footer with references
 st.markdown("---")
 st.markdown("""